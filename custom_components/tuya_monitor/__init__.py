@@ -2,14 +2,14 @@
 
 A simple integration to monitor property values from Tuya devices using the Tuya Cloud API.
 """
+import asyncio
 import logging
+import sys
+from collections import deque
+from dataclasses import dataclass
 from datetime import timedelta
-import json
+from urllib.parse import urlencode
 import time
-import hashlib
-import hmac
-import base64
-import uuid
 
 import aiohttp
 import async_timeout
@@ -21,31 +21,55 @@ from homeassistant.const import (
     CONF_CLIENT_SECRET,
     CONF_REGION,
     CONF_ACCESS_TOKEN,
+    Platform,
 )
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator, 
     UpdateFailed
 )
-from homeassistant.const import Platform
 
 from .const import (
     DOMAIN,
     CONF_DEVICES,
-    CONF_DEVICE_ID,
     CONF_PROPERTIES,
     CONF_SCAN_INTERVAL,
-    CONF_USER_ID,
     CONF_REFRESH_TOKEN,
     CONF_TOKEN_EXPIRATION,
+    MIN_SCAN_INTERVAL,
+    MAX_SCAN_INTERVAL,
+    CHANGE_HISTORY_SIZE,
+    MAX_CONSECUTIVE_FAILURES,
+    BATCH_RETRY_DELAY,
+    TOKEN_EXPIRY_BUFFER,
 )
 
-from .token_manager import refresh_tuya_token, get_new_token, generate_sign, generate_nonce
+from .token_manager import (
+    TUYA_REGION_ENDPOINTS,
+    TUYA_STATIC_HEADERS,
+    json_loads,
+    get_cached_token,
+    invalidate_cached_token,
+    hmac_template,
+    business_sign_prefix,
+    sign_business_request,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = [Platform.SENSOR]
 
+# Resolves a region code to its API base URL
+_REGION_GET = TUYA_REGION_ENDPOINTS.get
+
+# Maximum number of device IDs accepted by the batch status endpoint
+MAX_BATCH_DEVICES = 20
+
+# Maximum number of batch requests in flight at once
+MAX_CONCURRENT_REQUESTS = 4
+
+# Tuya error codes reporting that the access token is invalid or expired
+TOKEN_INVALID_CODES = {1010}
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up Tuya Monitor from a config entry."""
     # Store a reference to the entry to access options later
@@ -54,37 +78,71 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     # Get Tuya API credentials from config entry
     config = dict(entry.data)
     
-    # Create a dictionary to store coordinators for each device
-    coordinators = {}
+    # Group the devices by scan interval; each group is polled by one
+    # coordinator that fetches the status of its devices in batches
+    device_groups = {}
     
-    # Setup coordinators for each configured device
     devices = entry.options.get(CONF_DEVICES, {})
     if not devices:
         _LOGGER.warning("No Tuya devices configured")
     
     for device_id, device_config in devices.items():
-        _LOGGER.info(f"Setting up coordinator for device: {device_id}")
-        
-        # Ensure properties is a list
+        # The options flow stores properties as a normalized list
         properties = device_config.get(CONF_PROPERTIES, [])
-        if isinstance(properties, str):
-            properties = [p.strip() for p in properties.split(",")]
-            
-        _LOGGER.info(f"Device properties: {properties}")
+        _LOGGER.info("Device %s properties: %s", device_id, properties)
         
-        coordinator = TuyaDeviceCoordinator(
-            hass,
-            config,
-            device_id,
-            properties,
-            device_config.get(CONF_SCAN_INTERVAL, 60)
+        scan_interval = device_config.get(CONF_SCAN_INTERVAL, 60)
+        device_groups.setdefault(scan_interval, {})[device_id] = properties
+    
+    # Nothing is polled when no device is configured, so only create the
+    # session and coordinators when there is something to fetch
+    coordinators = {}
+    if device_groups:
+        # Dedicated session keeping connections to the Tuya API host alive
+        # between polls, so each poll skips the TCP and TLS handshakes
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=4,
+                keepalive_timeout=300,
+                ttl_dns_cache=600
+            )
         )
-        try:
-            await coordinator.async_config_entry_first_refresh()
-            coordinators[device_id] = coordinator
-            _LOGGER.info(f"Coordinator setup successful for device: {device_id}")
-        except Exception as err:
-            _LOGGER.error(f"Failed to setup coordinator for device {device_id}: {err}", exc_info=True)
+        # Closed whenever the entry is unloaded, including when setup fails
+        # after this point
+        entry.async_on_unload(session.close)
+        
+        # Serializes token refreshes across the coordinators of the entry
+        token_lock = asyncio.Lock()
+        
+        group_coordinators = [
+            TuyaBulkCoordinator(
+                hass,
+                entry.entry_id,
+                session,
+                token_lock,
+                config,
+                group_devices,
+                scan_interval
+            )
+            for scan_interval, group_devices in device_groups.items()
+        ]
+        
+        # Run the first refresh of every group concurrently
+        results = await asyncio.gather(
+            *(coordinator.async_config_entry_first_refresh() for coordinator in group_coordinators),
+            return_exceptions=True
+        )
+        
+        # Map each device to its group's coordinator for use in the sensor
+        # platform
+        for coordinator, result in zip(group_coordinators, results):
+            if isinstance(result, Exception):
+                _LOGGER.error("Failed to setup coordinator for devices %s: %s", coordinator.device_ids, result, exc_info=result)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                coordinators.update(dict.fromkeys(coordinator.device_ids, coordinator))
+                _LOGGER.info("Coordinator setup successful for devices: %s", coordinator.device_ids)
     
     # Store coordinators in hass.data for use in sensor platform
     hass.data[DOMAIN][entry.entry_id] = {
@@ -100,199 +158,444 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     
+    # The session is closed by the callback registered with async_on_unload
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
+        
+        # Do not keep serving the entry's token after it is unloaded or
+        # removed; its credentials may change before it is set up again
+        invalidate_cached_token(entry.data[CONF_CLIENT_ID], entry.data[CONF_REGION])
     
     return unload_ok
 
-def get_device_sign(client_id, access_token, secret, t):
-    """Generate Tuya API signature for device requests."""
-    message = client_id + access_token + t
-    sign = hmac.new(
-        secret.encode('utf-8'),
-        message.encode('utf-8'),
-        hashlib.sha256
-    ).hexdigest().upper()
-    return sign
+@dataclass(slots=True)
+class _PollContext:
+    """Values resolved once per coordinator and used on every poll."""
+    
+    url: str
+    batches: list
+    device_urls: dict
+    property_filters: dict
+    client_id: str
+    hmac_template: object
+    # Headers that are the same on every request of the coordinator
+    headers: dict
+    # Set by TuyaBulkCoordinator.update_access_token
+    access_token: str = ""
+    # client_id + access_token, the constant head of each signed message
+    sign_prefix: bytes = b""
 
-class TuyaDeviceCoordinator(DataUpdateCoordinator):
-    """Coordinator for Tuya devices."""
+class TuyaApiError(Exception):
+    """Error reported by the Tuya API for a request."""
+
+class TuyaBulkCoordinator(DataUpdateCoordinator):
+    """Coordinator fetching the status of all configured Tuya devices."""
 
     def __init__(
         self, 
         hass, 
+        entry_id,
+        session,
+        token_lock,
         config,
-        device_id, 
-        properties, 
+        devices, 
         scan_interval
     ):
-        """Initialize the coordinator."""
+        """Initialize the coordinator.
+        
+        devices maps each device ID to the list of property codes to keep
+        (an empty list keeps every property).
+        """
+        # The Tuya cloud caches device status for about 30 seconds, so
+        # polling faster only returns the same data
+        effective_interval = max(int(scan_interval), MIN_SCAN_INTERVAL)
+        if effective_interval != scan_interval:
+            _LOGGER.warning(
+                "Clamping scan_interval from %s to %s seconds (Tuya cache TTL)",
+                scan_interval,
+                effective_interval
+            )
+        scan_interval = effective_interval
+        
         super().__init__(
             hass,
             _LOGGER,
-            name=f"Tuya Device {device_id}",
-            update_interval=timedelta(seconds=scan_interval)
+            name=f"Tuya Devices ({scan_interval}s)",
+            update_interval=timedelta(seconds=scan_interval),
+            # Only notify sensors when the fetched data actually changed
+            always_update=False
         )
         self.hass = hass
+        self._entry_id = entry_id
+        self._session = session
+        self._token_lock = token_lock
+        
+        # Token expiry the refresh deadline was computed for, and the
+        # time.monotonic() value at which the token must be refreshed
+        self._token_expiration = None
+        self._token_deadline = 0
         self.config = config
-        self.device_id = device_id
-        self.properties = properties
+        self.devices = devices
+        self.device_ids = list(devices)
+        
+        # The region never changes for a coordinator, so build the URL once.
+        # The batch endpoint accepts up to 20 device IDs per call
+        base_url = _REGION_GET(config.get(CONF_REGION, "us"), TUYA_REGION_ENDPOINTS["us"])
+        
+        self._ctx = _PollContext(
+            url=f"{base_url}/v1.0/iot-03/devices/status",
+            # Full URL and device IDs of each batch request, encoded once
+            # since the device list is fixed for the lifetime of the
+            # coordinator. Commas are kept as the separator Tuya expects
+            # between device IDs
+            batches=[
+                (
+                    f"{base_url}/v1.0/iot-03/devices/status?" + urlencode(
+                        {"device_ids": ",".join(batch_ids)}, safe=","
+                    ),
+                    batch_ids
+                )
+                for start in range(0, len(self.device_ids), MAX_BATCH_DEVICES)
+                for batch_ids in (self.device_ids[start:start + MAX_BATCH_DEVICES],)
+            ],
+            # Per-device status URLs, used when the batch endpoint fails
+            device_urls={
+                device_id: f"{base_url}/v1.0/devices/{device_id}/status"
+                for device_id in self.device_ids
+            },
+            # Sets of property codes to keep for each device, for O(1)
+            # lookups while filtering the API response; None keeps every
+            # property of the device
+            property_filters={
+                device_id: frozenset(map(sys.intern, properties)) if properties else None
+                for device_id, properties in devices.items()
+            },
+            client_id=config[CONF_CLIENT_ID],
+            # The client secret is fixed, so the keyed HMAC is built once
+            # and shared by the coordinators using the same secret
+            hmac_template=hmac_template(config[CONF_CLIENT_SECRET].encode('utf-8')),
+            headers={**TUYA_STATIC_HEADERS, "client_id": config[CONF_CLIENT_ID]}
+        )
+        self.update_access_token(config[CONF_ACCESS_TOKEN])
+        
+        # Configured interval, the fastest the group is polled, and the
+        # slowest it backs off to
+        self._scan_interval = scan_interval
+        self._max_interval = max(scan_interval, MAX_SCAN_INTERVAL)
+        
+        # Times of recent value changes of each device, used to adapt the
+        # polling interval to how often the devices change
+        self._change_times = {
+            device_id: deque(maxlen=CHANGE_HISTORY_SIZE) for device_id in self.device_ids
+        }
+        self._polling_started = time.monotonic()
+        
+        # Limits the number of API requests in flight at once
+        self._batch_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        
+        # Number of polls in a row that failed with an API error
+        self._consecutive_failures = 0
+        
+        # Polls in a row each device failed in the per-device fallback, and
+        # the time until which a failed batch is fetched device by device
+        self._device_failures = {}
+        self._batch_retry_at = {}
+
+    def update_access_token(self, access_token):
+        """Use a newly issued access token for the following requests."""
+        self._ctx.access_token = access_token
+        self._ctx.sign_prefix = business_sign_prefix(self._ctx.client_id, access_token)
+
+    def _api_failure(self, message):
+        """Return the last data on a transient API error, or raise.
+        
+        Sensors keep their state through isolated failures; UpdateFailed is
+        only raised once MAX_CONSECUTIVE_FAILURES polls in a row failed.
+        """
+        self._consecutive_failures += 1
+        if self._consecutive_failures < MAX_CONSECUTIVE_FAILURES and self.data is not None:
+            _LOGGER.warning("Transient Tuya API error, keeping last data: %s", message)
+            return self.data
+        
+        raise UpdateFailed(message)
+
+    def _next_interval(self, data):
+        """Record which devices changed and return the next poll interval.
+        
+        Each device asks to be polled at twice the rate its values changed
+        recently, backing off while it stays unchanged. The group follows
+        its fastest-changing device, but the configured interval is the
+        polling budget: it is never polled faster than that, and backs off
+        at most to MAX_SCAN_INTERVAL (or the configured interval if larger).
+        """
+        now = time.monotonic()
+        previous = self.data
+        interval = self._max_interval
+        
+        # Record the changes of every device before estimating, so stopping
+        # early below never drops a device's change
+        if previous is not None:
+            for device_id, change_times in self._change_times.items():
+                if data.get(device_id) != previous.get(device_id):
+                    change_times.append(now)
+        
+        for change_times in self._change_times.values():
+            if len(change_times) >= 2:
+                mean_gap = (change_times[-1] - change_times[0]) / (len(change_times) - 1)
+            else:
+                mean_gap = 0
+            
+            # Stretch the estimate while the device stays unchanged for
+            # longer than usual; a device that never changed backs off from
+            # the time polling started
+            last_change = change_times[-1] if change_times else self._polling_started
+            interval = min(interval, max(mean_gap, now - last_change) / 2)
+            
+            if interval <= self._scan_interval:
+                break
+        
+        return max(interval, self._scan_interval)
+
+    def _filter_status(self, device_id, status):
+        """Map a device's status list to {code: value}, keeping wanted codes."""
+        wanted = self._ctx.property_filters[device_id]
+        
+        # Codes are interned so the keys are the same string objects as the
+        # sensors' property codes and lookups compare by identity
+        if wanted is not None:
+            return {
+                sys.intern(code): status_item.get("value")
+                for status_item in status
+                if (code := status_item.get("code")) in wanted
+            }
+        return {
+            sys.intern(code): status_item.get("value")
+            for status_item in status
+            if (code := status_item.get("code")) is not None
+        }
+
+    async def _async_get_result(self, headers, url):
+        """Make a signed GET request and return the "result" of the response."""
+        async with self._batch_semaphore, self._session.get(
+            url, headers=headers
+        ) as response:
+            if response.status != 200:
+                _LOGGER.error("API Error Response: %s", await response.text())
+                raise TuyaApiError(f"API returned status code {response.status}")
+            
+            # Parse the raw body; it is only decoded to text for logging
+            body = await response.read()
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("API Response: %s", body.decode("utf-8", "replace"))
+            
+            try:
+                data = json_loads(body)
+            except Exception as e:
+                _LOGGER.error("Failed to parse JSON response: %s", e)
+                _LOGGER.error("Response text: %s", body.decode('utf-8', 'replace'))
+                raise UpdateFailed(f"Failed to parse API response: {e}")
+            
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Full API Response: %s", data)
+            
+            # Check success status
+            if not data.get("success", False):
+                error_msg = data.get("msg", "Unknown error")
+                _LOGGER.error("API error: %s", error_msg)
+                if data.get("code") in TOKEN_INVALID_CODES:
+                    self._invalidate_token()
+                raise TuyaApiError(f"API request was not successful: {error_msg}")
+            
+            return data.get("result", [])
+
+    async def _async_fetch_batch(self, headers, url, batch_ids):
+        """Fetch the status of one batch of devices.
+        
+        Returns a {device_id: {code: value}} mapping for the batch. If the
+        batch endpoint fails, the devices are fetched one by one instead,
+        and keep being fetched that way for BATCH_RETRY_DELAY seconds.
+        """
+        if time.monotonic() < self._batch_retry_at.get(url, 0):
+            return await self._async_fetch_devices(headers, batch_ids, None)
+        
+        try:
+            result = await self._async_get_result(headers, url)
+        except TuyaApiError as err:
+            _LOGGER.warning("Batch status request failed (%s), fetching devices individually", err)
+            self._batch_retry_at[url] = time.monotonic() + BATCH_RETRY_DELAY
+            return await self._async_fetch_devices(headers, batch_ids, err)
+        
+        self._batch_retry_at.pop(url, None)
+        if self._device_failures:
+            for device_id in batch_ids:
+                self._device_failures.pop(device_id, None)
+        
+        # Each result entry holds the status list of one device
+        return {
+            device_id: self._filter_status(device_id, device.get("status", []))
+            for device in result
+            if (device_id := device.get("id")) in self.devices
+        }
+
+    async def _async_fetch_devices(self, headers, batch_ids, batch_error):
+        """Fetch the status of each device of a batch concurrently.
+        
+        A device whose request fails keeps its last data until it failed
+        MAX_CONSECUTIVE_FAILURES polls in a row, then is left out. If no
+        device succeeded, batch_error (or the first device error) is raised.
+        """
+        results = await asyncio.gather(
+            *(self._async_get_result(headers, self._ctx.device_urls[device_id]) for device_id in batch_ids),
+            return_exceptions=True
+        )
+        
+        devices_data = {}
+        device_error = None
+        fresh = 0
+        for device_id, result in zip(batch_ids, results):
+            if isinstance(result, TuyaApiError):
+                device_error = device_error or result
+                failures = self._device_failures.get(device_id, 0) + 1
+                self._device_failures[device_id] = failures
+                
+                if failures < MAX_CONSECUTIVE_FAILURES and self.data and device_id in self.data:
+                    _LOGGER.warning("Transient error for device %s, keeping last data: %s", device_id, result)
+                    devices_data[device_id] = self.data[device_id]
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            self._device_failures.pop(device_id, None)
+            devices_data[device_id] = self._filter_status(device_id, result)
+            fresh += 1
+        
+        # With no fresh data at all the whole poll failed; raising lets it
+        # count towards the coordinator's consecutive failures
+        if device_error is not None and fresh == 0:
+            raise batch_error or device_error
+        return devices_data
+
+    def _token_expiring(self):
+        """Return True if the access token expires within the buffer."""
+        expiration = self.config.get(CONF_TOKEN_EXPIRATION, 0)
+        if expiration != self._token_expiration:
+            # Convert the wall-clock expiry into a monotonic refresh deadline
+            # once per token, so later checks are a single clock read that
+            # is not affected by system clock changes
+            self._token_expiration = expiration
+            self._token_deadline = (
+                time.monotonic() + expiration - time.time() - TOKEN_EXPIRY_BUFFER
+            )
+        
+        return time.monotonic() >= self._token_deadline
+
+    def _invalidate_token(self):
+        """Have the next poll obtain a new token instead of the current one."""
+        invalidate_cached_token(self._ctx.client_id, self.config[CONF_REGION])
+        self._token_deadline = 0
+
+    async def _async_refresh_token(self):
+        """Obtain a new access token and store it in the shared config."""
+        _LOGGER.info("Access token expiring soon, refreshing...")
+        
+        # Reuse a token another entry of the same client already obtained,
+        # otherwise refresh it (or request a new one)
+        new_token_info = await get_cached_token(
+            self._session,
+            self._ctx.client_id,
+            self.config[CONF_CLIENT_SECRET],
+            self.config[CONF_REGION],
+            self.config.get(CONF_REFRESH_TOKEN)
+        )
+        
+        if new_token_info:
+            # Update config with new token
+            self.config[CONF_ACCESS_TOKEN] = new_token_info["access_token"]
+            self.config[CONF_REFRESH_TOKEN] = new_token_info["refresh_token"]
+            self.config[CONF_TOKEN_EXPIRATION] = new_token_info["expiration_time"]
+            self.update_access_token(new_token_info["access_token"])
+            
+            # The monotonic expiry is known here, so no wall-clock conversion
+            # is needed for this coordinator's next checks
+            self._token_expiration = new_token_info["expiration_time"]
+            self._token_deadline = new_token_info["expires_at_mono"] - TOKEN_EXPIRY_BUFFER
+            
+            # Update config entry too
+            entry = self.hass.config_entries.async_get_entry(self._entry_id)
+            
+            if entry:
+                self.hass.config_entries.async_update_entry(
+                    entry,
+                    data={
+                        **entry.data,
+                        CONF_ACCESS_TOKEN: new_token_info["access_token"],
+                        CONF_REFRESH_TOKEN: new_token_info["refresh_token"],
+                        CONF_TOKEN_EXPIRATION: new_token_info["expiration_time"]
+                    }
+                )
+        else:
+            _LOGGER.error("Failed to refresh access token")
 
     async def _async_update_data(self):
         """Fetch data from Tuya API."""
         try:
+            # If token expires in the next 5 minutes, refresh it. The lock is
+            # shared by the coordinators of the entry, so only one of them
+            # refreshes while the others wait, then reuse its token. This
+            # runs outside the poll timeout below: token requests have their
+            # own timeout and retries, which could not complete within it
+            if self._token_expiring():
+                async with self._token_lock:
+                    if self._token_expiring():
+                        await self._async_refresh_token()
+            
+            # Coordinators of the same entry share the config dict, so pick
+            # up a token another coordinator has refreshed
+            if self.config[CONF_ACCESS_TOKEN] != self._ctx.access_token:
+                self.update_access_token(self.config[CONF_ACCESS_TOKEN])
+            
             async with async_timeout.timeout(10):
-                # Check if token needs refresh
-                current_time = int(time.time())
-                token_expiration = self.config.get(CONF_TOKEN_EXPIRATION, 0)
-                
-                # If token expires in the next 5 minutes, refresh it
-                if current_time + 300 > token_expiration:
-                    _LOGGER.info("Access token expiring soon, refreshing...")
-                    session = async_get_clientsession(self.hass)
-                    
-                    # Try to refresh using refresh token first
-                    new_token_info = None
-                    if CONF_REFRESH_TOKEN in self.config:
-                        new_token_info = await refresh_tuya_token(
-                            session,
-                            self.config[CONF_CLIENT_ID],
-                            self.config[CONF_CLIENT_SECRET],
-                            self.config[CONF_REFRESH_TOKEN],
-                            self.config[CONF_REGION]
-                        )
-                    
-                    # If refresh failed or no refresh token, get a new token
-                    if not new_token_info:
-                        new_token_info = await get_new_token(
-                            session,
-                            self.config[CONF_CLIENT_ID],
-                            self.config[CONF_CLIENT_SECRET],
-                            self.config[CONF_REGION]
-                        )
-                    
-                    if new_token_info:
-                        # Update config with new token
-                        self.config[CONF_ACCESS_TOKEN] = new_token_info["access_token"]
-                        self.config[CONF_REFRESH_TOKEN] = new_token_info["refresh_token"]
-                        self.config[CONF_TOKEN_EXPIRATION] = new_token_info["expiration_time"]
-                        
-                        # Update config entry too
-                        entry = None
-                        for config_entry in self.hass.config_entries.async_entries(DOMAIN):
-                            if config_entry.data.get(CONF_CLIENT_ID) == self.config[CONF_CLIENT_ID]:
-                                entry = config_entry
-                                break
-                        
-                        if entry:
-                            self.hass.config_entries.async_update_entry(
-                                entry,
-                                data={
-                                    **entry.data,
-                                    CONF_ACCESS_TOKEN: new_token_info["access_token"],
-                                    CONF_REFRESH_TOKEN: new_token_info["refresh_token"],
-                                    CONF_TOKEN_EXPIRATION: new_token_info["expiration_time"]
-                                }
-                            )
-                    else:
-                        _LOGGER.error("Failed to refresh access token")
-                
-                # Construct the Tuya API endpoint for device properties
-                region_map = {
-                    "us": "https://openapi.tuyaus.com",
-                    "eu": "https://openapi.tuyaeu.com",
-                    "cn": "https://openapi.tuyacn.com",
-                    "in": "https://openapi.tuyain.com"
+                # Prepare headers for authentication, signing the request
+                # with the current timestamp
+                timestamp = str(time.time_ns() // 1_000_000)
+                headers = {
+                    **self._ctx.headers,
+                    "access_token": self._ctx.access_token,
+                    "t": timestamp,
+                    "sign": sign_business_request(
+                        self._ctx.hmac_template, self._ctx.sign_prefix, timestamp
+                    )
                 }
-                base_url = region_map.get(self.config.get(CONF_REGION, "us"), 
-                                          "https://openapi.tuyaus.com")
                 
-                # Prepare timestamp, client info and access token
-                timestamp = str(int(time.time() * 1000))
-                client_id = self.config[CONF_CLIENT_ID]
-                client_secret = self.config[CONF_CLIENT_SECRET]
-                access_token = self.config[CONF_ACCESS_TOKEN]
+                # Headers are not logged since they carry the access token
+                _LOGGER.debug("Fetching data from URL: %s", self._ctx.url)
                 
-                # Generate signature for device access
-                signature = get_device_sign(
-                    client_id,
-                    access_token,
-                    client_secret,
-                    timestamp
-                )
-                
-                # Construct the URL for fetching device properties
-                url = f"{base_url}/v1.0/devices/{self.device_id}/status"
+                # Fetch the batches concurrently, at most
+                # MAX_CONCURRENT_REQUESTS at a time to stay under Tuya's
+                # burst limits
+                try:
+                    batches = await asyncio.gather(
+                        *(self._async_fetch_batch(headers, url, batch_ids) for url, batch_ids in self._ctx.batches)
+                    )
+                except TuyaApiError as err:
+                    return self._api_failure(str(err))
                 
-                # Prepare headers for authentication
-                headers = {
-                    "client_id": client_id,
-                    "access_token": access_token,
-                    "t": timestamp,
-                    "sign": signature,
-                    "sign_method": "HMAC-SHA256",
-                    "Content-Type": "application/json"
-                }
+                devices_data = {}
+                for batch in batches:
+                    devices_data.update(batch)
                 
-                _LOGGER.debug(f"Fetching data from URL: {url}")
-                _LOGGER.debug(f"Headers: {headers}")
+                if not devices_data:
+                    _LOGGER.warning("No device status data returned from API")
                 
-                # Use the session from Home Assistant
-                session = async_get_clientsession(self.hass)
+                if _LOGGER.isEnabledFor(logging.DEBUG):
+                    _LOGGER.debug("Filtered Properties: %s", devices_data)
                 
-                # Make the API request
-                async with session.get(url, headers=headers) as response:
-                    response_text = await response.text()
-                    _LOGGER.debug(f"API Response: {response_text}")
-                    
-                    if response.status != 200:
-                        _LOGGER.error(f"API Error Response: {response_text}")
-                        raise UpdateFailed(f"API returned status code {response.status}")
-                    
-                    # Parse the response
-                    try:
-                        data = await response.json()
-                    except Exception as e:
-                        _LOGGER.error(f"Failed to parse JSON response: {e}")
-                        _LOGGER.error(f"Response text: {response_text}")
-                        raise UpdateFailed(f"Failed to parse API response: {e}")
-                    
-                    _LOGGER.debug(f"Full API Response: {data}")
-                    
-                    # Check success status
-                    if not data.get("success", False):
-                        error_msg = data.get("msg", "Unknown error")
-                        _LOGGER.error(f"API error: {error_msg}")
-                        raise UpdateFailed(f"API request was not successful: {error_msg}")
-                    
-                    # Process the response data according to the Tuya API structure
-                    result = data.get("result", [])
-                    if not result:
-                        _LOGGER.warning("No device status data returned from API")
-                        return {"properties": []}
-                    
-                    # Format the device properties in a standard way
-                    properties = []
-                    
-                    # Filter properties if needed
-                    filter_properties = len(self.properties) > 0
-                    
-                    for status_item in result:
-                        code = status_item.get("code")
-                        value = status_item.get("value")
-                        
-                        if not filter_properties or code in self.properties:
-                            properties.append({
-                                "code": code,
-                                "value": value
-                            })
-                    
-                    _LOGGER.debug(f"Filtered Properties: {properties}")
-                    return {"properties": properties}
+                self._consecutive_failures = 0
+                self.update_interval = timedelta(seconds=self._next_interval(devices_data))
+                return devices_data
         
         except aiohttp.ClientError as err:
-            _LOGGER.error(f"Tuya API connection error: {err}", exc_info=True)
+            _LOGGER.error("Tuya API connection error: %s", err, exc_info=True)
             raise UpdateFailed(f"Error communicating with Tuya API: {err}") from err
         except Exception as err:
-            _LOGGER.error(f"Unexpected error fetching Tuya device data: {err}", exc_info=True)
+            _LOGGER.error("Unexpected error fetching Tuya device data: %s", err, exc_info=True)
             raise UpdateFailed(f"Unexpected error: {err}")
@@ -1,16 +1,12 @@
 """Config flow for Tuya Monitor integration."""
+import functools
 import logging
+import sys
 import voluptuous as vol
-import aiohttp
-import time
-import hashlib
-import hmac
-import base64
-import uuid
-import async_timeout
 
 from homeassistant import config_entries
 from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.const import (
     CONF_NAME,
     CONF_CLIENT_ID,
@@ -29,111 +25,43 @@ from .const import (
     CONF_REFRESH_TOKEN,
     CONF_TOKEN_EXPIRATION,
 )
-
-TUYA_REGION_ENDPOINTS = {
-    "us": "https://openapi.tuyaus.com",
-    "eu": "https://openapi.tuyaeu.com",
-    "cn": "https://openapi.tuyacn.com",
-    "in": "https://openapi.tuyain.com"
-}
+from .token_manager import get_new_token
 
 _LOGGER = logging.getLogger(__name__)
 
-def generate_sign(client_id, client_secret, timestamp, nonce, method='HMAC-SHA256'):
-    """Generate Tuya API signature using the Tuya signature method.
+# Static form schemas are built once at import instead of on every render
+_USER_SCHEMA = vol.Schema({
+    vol.Required(CONF_NAME, default="Tuya Monitor"): str,
+    vol.Required(CONF_CLIENT_ID): str,
+    vol.Required(CONF_CLIENT_SECRET): str,
+    vol.Required(CONF_REGION, default="us"): vol.In(["us", "eu", "cn", "in"]),
+    vol.Optional(CONF_USER_ID): str,
+})
+
+_MENU_SCHEMA = vol.Schema({
+    vol.Required("menu_option", default="add_device"): vol.In({
+        "add_device": "Add Device",
+        "remove_device": "Remove Device",
+    }),
+})
+
+_ADD_DEVICE_SCHEMA = vol.Schema({
+    vol.Required(CONF_DEVICE_ID): str,
+    vol.Required(CONF_PROPERTIES, description="Comma-separated list of properties (leave empty to fetch all)"): str,
+    vol.Required(CONF_SCAN_INTERVAL, default=60): int,
+})
+
+
+@functools.lru_cache(maxsize=8)
+def _remove_device_schema(device_ids):
+    """Return the remove-device schema for a sorted tuple of device IDs.
     
-    For token requests, we need to use this specific signature method.
+    Only called with at least one device: the step returns to the menu
+    when none is configured.
     """
-    # Create string to sign
-    string_to_sign = client_id + timestamp + nonce
-    
-    # Sign it
-    signature = hmac.new(
-        client_secret.encode('utf-8'),
-        string_to_sign.encode('utf-8'),
-        hashlib.sha256
-    ).digest()
-    
-    # Base64 encode the signature
-    sign_hex = base64.b64encode(signature).decode('utf-8')
-    
-    return sign_hex
-
-def generate_nonce():
-    """Generate a random nonce string."""
-    return str(uuid.uuid4())
-
-
-async def get_new_token(session, client_id, client_secret, region="us"):
-    """Get a new token from Tuya API."""
-    try:
-        base_url = TUYA_REGION_ENDPOINTS.get(region, TUYA_REGION_ENDPOINTS["us"])
-        token_url = f"{base_url}/v1.0/token?grant_type=1"
-        
-        # Generate timestamp and nonce
-        timestamp = str(int(time.time() * 1000))
-        nonce = generate_nonce()
-        
-        # Generate signature
-        sign = generate_sign(client_id, client_secret, timestamp, nonce)
-        
-        # Prepare headers
-        headers = {
-            "client_id": client_id,
-            "sign": sign,
-            "t": timestamp,
-            "sign_method": "HMAC-SHA256",
-            "nonce": nonce,
-            "Content-Type": "application/json"
-        }
-        
-        _LOGGER.debug(f"Attempting to get new token with URL: {token_url}")
-        _LOGGER.debug(f"Headers: {headers}")
-        
-        async with async_timeout.timeout(10):
-            async with session.get(token_url, headers=headers) as response:
-                response_text = await response.text()
-                _LOGGER.debug(f"Token API response: {response_text}")
-                
-                if response.status != 200:
-                    _LOGGER.error(f"Get token failed with status {response.status}: {response_text}")
-                    return None
-                    
-                try:
-                    data = await response.json()
-                except Exception as e:
-                    _LOGGER.error(f"Failed to parse JSON response: {e}")
-                    _LOGGER.error(f"Response text: {response_text}")
-                    return None
-                
-                _LOGGER.debug(f"Token response: {data}")
-                
-                if not data.get("success", False):
-                    error_msg = data.get("msg", "Unknown error")
-                    _LOGGER.error(f"Get token failed: {error_msg}")
-                    return None
-                
-                result = data.get("result", {})
-                if not result:
-                    _LOGGER.error("Empty result from get token")
-                    return None
-                
-                access_token = result.get("access_token")
-                refresh_token = result.get("refresh_token")
-                expire_time = result.get("expire_time")
-                
-                _LOGGER.info(f"Successfully obtained new token. Token expires in {expire_time} seconds")
-                
-                return {
-                    "access_token": access_token,
-                    "refresh_token": refresh_token,
-                    "expire_time": expire_time,
-                    "expiration_time": int(time.time()) + int(expire_time)
-                }
-    
-    except Exception as e:
-        _LOGGER.error(f"Error getting new Tuya token: {e}", exc_info=True)
-        return None
+    return vol.Schema({
+        vol.Required(CONF_DEVICE_ID): vol.In(device_ids),
+    })
 
 class TuyaMonitorConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Tuya Monitor."""
@@ -147,58 +75,44 @@ class TuyaMonitorConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         if user_input is not None:
             try:
-                # Create a simple session for this request only
-                async with aiohttp.ClientSession() as session:
-                    # Get a fresh token using provided credentials
-                    new_token_info = await get_new_token(
-                        session, 
-                        user_input[CONF_CLIENT_ID],
-                        user_input[CONF_CLIENT_SECRET],
-                        user_input[CONF_REGION]
-                    )
+                # Use Home Assistant's shared session so the connection is
+                # pooled instead of opened for this request only
+                session = async_get_clientsession(self.hass)
+                
+                # Get a fresh token using provided credentials
+                new_token_info = await get_new_token(
+                    session, 
+                    user_input[CONF_CLIENT_ID],
+                    user_input[CONF_CLIENT_SECRET],
+                    user_input[CONF_REGION]
+                )
                 
-                # Only proceed if we successfully got a token
+                # A failed token request is the credential validation
+                # failure; the form below is shown again with the error
                 if not new_token_info:
                     errors["base"] = "token_failed"
-                    return self.async_show_form(
-                        step_id="user",
-                        data_schema=vol.Schema({
-                            vol.Required(CONF_NAME, default="Tuya Monitor"): str,
-                            vol.Required(CONF_CLIENT_ID): str,
-                            vol.Required(CONF_CLIENT_SECRET): str,
-                            vol.Required(CONF_REGION, default="us"): vol.In(["us", "eu", "cn", "in"]),
-                            vol.Optional(CONF_USER_ID): str,
-                        }),
-                        errors=errors,
+                else:
+                    # Create the config entry with the fresh token
+                    return self.async_create_entry(
+                        title=user_input.get(CONF_NAME, "Tuya Monitor"),
+                        data={
+                            CONF_CLIENT_ID: user_input[CONF_CLIENT_ID],
+                            CONF_CLIENT_SECRET: user_input[CONF_CLIENT_SECRET],
+                            CONF_REGION: user_input[CONF_REGION],
+                            CONF_ACCESS_TOKEN: new_token_info["access_token"],
+                            CONF_REFRESH_TOKEN: new_token_info["refresh_token"],
+                            CONF_TOKEN_EXPIRATION: new_token_info["expiration_time"],
+                            CONF_USER_ID: user_input.get(CONF_USER_ID, ""),
+                        },
+                        options={CONF_DEVICES: {}},
                     )
-                
-                # Create the config entry with the fresh token
-                return self.async_create_entry(
-                    title=user_input.get(CONF_NAME, "Tuya Monitor"),
-                    data={
-                        CONF_CLIENT_ID: user_input[CONF_CLIENT_ID],
-                        CONF_CLIENT_SECRET: user_input[CONF_CLIENT_SECRET],
-                        CONF_REGION: user_input[CONF_REGION],
-                        CONF_ACCESS_TOKEN: new_token_info["access_token"],
-                        CONF_REFRESH_TOKEN: new_token_info["refresh_token"],
-                        CONF_TOKEN_EXPIRATION: new_token_info["expiration_time"],
-                        CONF_USER_ID: user_input.get(CONF_USER_ID, ""),
-                    },
-                    options={CONF_DEVICES: {}},
-                )
             except Exception as err:
-                _LOGGER.error(f"Error validating Tuya credentials: {err}", exc_info=True)
+                _LOGGER.error("Error validating Tuya credentials: %s", err, exc_info=True)
                 errors["base"] = "cannot_connect"
 
         return self.async_show_form(
             step_id="user",
-            data_schema=vol.Schema({
-                vol.Required(CONF_NAME, default="Tuya Monitor"): str,
-                vol.Required(CONF_CLIENT_ID): str,
-                vol.Required(CONF_CLIENT_SECRET): str,
-                vol.Required(CONF_REGION, default="us"): vol.In(["us", "eu", "cn", "in"]),
-                vol.Optional(CONF_USER_ID): str,
-            }),
+            data_schema=_USER_SCHEMA,
             errors=errors,
         )
 
@@ -215,9 +129,11 @@ class TuyaMonitorOptionsFlowHandler(config_entries.OptionsFlow):
     def __init__(self, config_entry):
         """Initialize options flow."""
         self.config_entry = config_entry
-        self.current_device_id = None
         self.options = dict(config_entry.options)
         self.devices = self.options.get(CONF_DEVICES, {})
+        # Sorted device IDs offered by the remove-device form, computed once
+        # per options flow
+        self._device_keys = tuple(sorted(self.devices))
 
     async def async_step_init(self, user_input=None):
         """Manage the options."""
@@ -233,12 +149,7 @@ class TuyaMonitorOptionsFlowHandler(config_entries.OptionsFlow):
 
         return self.async_show_form(
             step_id="menu",
-            data_schema=vol.Schema({
-                vol.Required("menu_option", default="add_device"): vol.In({
-                    "add_device": "Add Device",
-                    "remove_device": "Remove Device",
-                }),
-            }),
+            data_schema=_MENU_SCHEMA,
         )
 
     async def async_step_add_device(self, user_input=None):
@@ -248,11 +159,13 @@ class TuyaMonitorOptionsFlowHandler(config_entries.OptionsFlow):
         if user_input is not None:
             device_id = user_input[CONF_DEVICE_ID]
             
-            # Process properties as a list
-            if isinstance(user_input[CONF_PROPERTIES], str):
-                properties = [p.strip() for p in user_input[CONF_PROPERTIES].split(",") if p.strip()]
-            else:
-                properties = user_input[CONF_PROPERTIES]
+            # Normalize properties once at save time to a list without
+            # duplicates, keeping the order they were entered in, so setup
+            # can use it as is. A list rather than a tuple since options are
+            # stored as JSON
+            properties = list(dict.fromkeys(
+                sys.intern(p.strip()) for p in user_input[CONF_PROPERTIES].split(",") if p.strip()
+            ))
             
             # Create or update device configuration
             if CONF_DEVICES not in self.options:
@@ -267,11 +180,7 @@ class TuyaMonitorOptionsFlowHandler(config_entries.OptionsFlow):
 
         return self.async_show_form(
             step_id="add_device",
-            data_schema=vol.Schema({
-                vol.Required(CONF_DEVICE_ID): str,
-                vol.Required(CONF_PROPERTIES, description="Comma-separated list of properties (leave empty to fetch all)"): str,
-                vol.Required(CONF_SCAN_INTERVAL, default=60): int,
-            }),
+            data_schema=_ADD_DEVICE_SCHEMA,
             errors=errors,
         )
 
@@ -291,8 +200,6 @@ class TuyaMonitorOptionsFlowHandler(config_entries.OptionsFlow):
 
         return self.async_show_form(
             step_id="remove_device",
-            data_schema=vol.Schema({
-                vol.Required(CONF_DEVICE_ID): vol.In(list(self.devices.keys()) or ["NO_DEVICES"]),
-            }),
+            data_schema=_remove_device_schema(self._device_keys),
             errors=errors,
         )
@@ -1,7 +1,6 @@
 """Constants for the Tuya Monitor integration."""
 
 DOMAIN = "tuya_monitor"
-PLATFORMS = ["sensor"]
 
 CONF_USER_ID = "user_id"
 CONF_DEVICES = "devices"
@@ -13,3 +12,23 @@ CONF_TOKEN_EXPIRATION = "token_expiration"
 
 # Token expiration buffer (5 minutes in seconds)
 TOKEN_EXPIRY_BUFFER = 300
+
+# Attempts made for a token request failing with a transient error
+TOKEN_REQUEST_ATTEMPTS = 3
+
+# Shortest scan interval accepted (seconds); the Tuya cloud caches device
+# status for about 30 seconds
+MIN_SCAN_INTERVAL = 30
+# Longest interval the adaptive polling backs off to for quiet devices
+# (seconds), unless the configured interval is longer
+MAX_SCAN_INTERVAL = 600
+
+# Number of recent state changes used to estimate the change rate
+CHANGE_HISTORY_SIZE = 10
+
+# Consecutive failed polls tolerated before sensors become unavailable
+MAX_CONSECUTIVE_FAILURES = 3
+
+# Seconds a batch is fetched device by device after the batch status
+# request failed for it
+BATCH_RETRY_DELAY = 900
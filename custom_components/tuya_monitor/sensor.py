@@ -1,111 +1,126 @@
 """Sensor platform for Tuya Monitor integration."""
 import logging
-from typing import Optional, Dict, Any
+import sys
 
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
 )
+from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from .const import DOMAIN, CONF_DEVICES
 
 _LOGGER = logging.getLogger(__name__)
 
+# Marks a property absent from the device data
+_MISSING = object()
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback):
     """Set up Tuya Monitor sensors based on config entry."""
-    _LOGGER.info("Setting up Tuya Monitor sensors")
-    
     try:
         entry_data = hass.data[DOMAIN][entry.entry_id]
         coordinators = entry_data["coordinators"]
+        _LOGGER.debug("Setting up sensors for %s devices", len(coordinators))
         
-        _LOGGER.info(f"Found {len(coordinators)} coordinators")
-        
-        sensors = []
-        for device_id, coordinator in coordinators.items():
-            _LOGGER.info(f"Processing device: {device_id}")
-            
+        # Entities are streamed to Home Assistant without building a list;
+        # _iter_sensors handles the errors of building them
+        async_add_entities(_iter_sensors(entry, coordinators))
+    
+    except Exception as err:
+        _LOGGER.error("Error setting up Tuya Monitor sensors: %s", err, exc_info=True)
+
+def _iter_sensors(entry, coordinators):
+    """Yield a sensor for each property of each configured device.
+    
+    The generator is consumed by Home Assistant after async_setup_entry
+    returned, so errors are handled here: a device whose sensors cannot be
+    built is logged and skipped.
+    """
+    for device_id, coordinator in coordinators.items():
+        try:
             # Get the device data and properties from the entry options
             device_data = entry.options[CONF_DEVICES][device_id]
             
-            # Handle properties that might be a string or list
+            # The options flow stores properties as a normalized list
             properties = device_data.get("properties", [])
-            if isinstance(properties, str):
-                properties = [p.strip() for p in properties.split(",") if p.strip()]
-            
-            _LOGGER.info(f"Device properties: {properties}")
             
             # If empty properties list, create sensors for all properties found in the data
-            if not properties and coordinator.data and "properties" in coordinator.data:
-                for prop in coordinator.data["properties"]:
-                    if "code" in prop:
-                        properties.append(prop["code"])
-                _LOGGER.info(f"Auto-detected properties: {properties}")
+            if not properties and coordinator.data and device_id in coordinator.data:
+                properties = list(coordinator.data[device_id])
             
             # Create a sensor for each property
-            for property_code in properties:
-                sensor = TuyaPropertySensor(
-                    coordinator,
-                    device_id,
-                    property_code,
-                )
-                sensors.append(sensor)
-                _LOGGER.info(f"Created sensor for {device_id} - {property_code}")
+            sensors = [
+                TuyaPropertySensor(coordinator, device_id, property_code)
+                for property_code in properties
+            ]
+        except Exception as err:
+            _LOGGER.error("Error setting up Tuya Monitor sensors for %s: %s", device_id, err, exc_info=True)
+            continue
         
-        async_add_entities(sensors)
-        _LOGGER.info(f"Added {len(sensors)} Tuya Monitor sensors")
-    
-    except Exception as err:
-        _LOGGER.error(f"Error setting up Tuya Monitor sensors: {err}", exc_info=True)
+        yield from sensors
 
 class TuyaPropertySensor(CoordinatorEntity, SensorEntity):
     """Representation of a Tuya device property sensor."""
 
+    # The entity base classes keep a __dict__ for the _attr_* values, so
+    # only the attributes defined here get slots
+    __slots__ = ("device_id", "property_code", "_property_present")
+
     def __init__(self, coordinator, device_id, property_code):
         """Initialize the sensor."""
         super().__init__(coordinator)
         self.device_id = device_id
-        self.property_code = property_code
+        # Codes repeat across devices, so share one string object per code
+        self.property_code = sys.intern(property_code)
         self._attr_name = f"Tuya {device_id} {property_code}"
         self._attr_unique_id = f"{DOMAIN}_{device_id}_{property_code}"
         
-        _LOGGER.debug(f"Initializing sensor: {self._attr_name}")
+        # Device registry information never changes, so build it once
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, device_id)},
+            name=f"Tuya Device {device_id}",
+            manufacturer="Tuya",
+        )
+        
+        # The state is pushed on each coordinator update; start from the
+        # data of the refresh done during setup
+        self._update_native_value()
 
-    @property
-    def native_value(self):
-        """Return the state of the sensor."""
+    def _update_native_value(self):
+        """Set the state of the sensor from the coordinator data.
+        
+        Also records whether the property was present, so available does
+        not repeat the lookups.
+        """
+        self._attr_native_value = None
+        self._property_present = False
         try:
-            if not self.coordinator.data:
-                _LOGGER.warning(f"No data available for {self._attr_name}")
-                return None
+            data = self.coordinator.data
+            if not data:
+                _LOGGER.warning("No data available for %s", self._attr_name)
+                return
                 
-            if "properties" not in self.coordinator.data:
-                _LOGGER.warning(f"No properties in coordinator data for {self._attr_name}")
-                return None
+            properties = data.get(self.device_id)
+            if properties is None:
+                _LOGGER.warning("No properties in coordinator data for %s", self._attr_name)
+                return
                 
-            for prop in self.coordinator.data["properties"]:
-                if prop.get("code") == self.property_code:
-                    value = prop.get("value")
-                    _LOGGER.debug(f"Found value for {self.property_code}: {value}")
-                    return value
-            
-            _LOGGER.debug(f"Property {self.property_code} not found in data")
-            return None
+            # A single probe, with a sentinel as a property's value may be None
+            value = properties.get(self.property_code, _MISSING)
+            if value is not _MISSING:
+                self._attr_native_value = value
+                self._property_present = True
         except Exception as err:
-            _LOGGER.error(f"Error getting native value for {self._attr_name}: {err}", exc_info=True)
-            return None
+            _LOGGER.error("Error getting native value for %s: %s", self._attr_name, err, exc_info=True)
 
-    @property
-    def device_info(self):
-        """Return device registry information for this entity."""
-        return {
-            "identifiers": {(DOMAIN, self.device_id)},
-            "name": f"Tuya Device {self.device_id}",
-            "manufacturer": "Tuya",
-        }
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Update the state when the coordinator has new data."""
+        self._update_native_value()
+        self.async_write_ha_state()
 
     @property
     def available(self) -> bool:
@@ -114,9 +129,6 @@ class TuyaPropertySensor(CoordinatorEntity, SensorEntity):
         if not self.coordinator.last_update_success:
             return False
             
-        # Then check if we have data for this specific property
-        if not self.coordinator.data or "properties" not in self.coordinator.data:
-            return False
-            
-        # Check if this property exists in the data
-        return any(prop.get("code") == self.property_code for prop in self.coordinator.data["properties"])
+        # Then whether the last update had this property, as found when the
+        # state was set
+        return self._property_present
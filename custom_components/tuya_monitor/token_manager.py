@@ -1,14 +1,33 @@
-"""Token manager for Tuya API."""
+"""Token manager for Tuya API.
+
+The request functions take the caller's aiohttp session and never open
+one of their own: pass a long-lived session (Home Assistant's shared one
+from async_get_clientsession, or the config entry's session) so the
+HTTPS connection to the Tuya endpoint is kept alive between requests.
+"""
+import asyncio
+import functools
 import logging
 import time
 import hashlib
 import hmac
 import base64
-import uuid
+import json
+import secrets
 
 import aiohttp
 import async_timeout
 
+# JSON parser for API responses: orjson when available (it ships with
+# Home Assistant), else the standard library
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+from .const import TOKEN_EXPIRY_BUFFER, TOKEN_REQUEST_ATTEMPTS
+
 _LOGGER = logging.getLogger(__name__)
 
 TUYA_REGION_ENDPOINTS = {
@@ -18,168 +37,271 @@ TUYA_REGION_ENDPOINTS = {
     "in": "https://openapi.tuyain.com"
 }
 
-def generate_sign(client_id, client_secret, timestamp, nonce, method='HMAC-SHA256'):
-    """Generate Tuya API signature.
+# Token endpoints per region, formatted once at import
+_TOKEN_URLS = {
+    region: f"{base_url}/v1.0/token?grant_type=1"
+    for region, base_url in TUYA_REGION_ENDPOINTS.items()
+}
+# Prefix of the refresh endpoint per region; the refresh token is appended
+_REFRESH_URLS = {
+    region: f"{base_url}/v1.0/token/"
+    for region, base_url in TUYA_REGION_ENDPOINTS.items()
+}
+
+# Headers shared by every signed Tuya request, token and business alike
+TUYA_STATIC_HEADERS = {
+    "sign_method": "HMAC-SHA256",
+    "Content-Type": "application/json"
+}
+
+@functools.lru_cache(maxsize=8)
+def hmac_template(secret_bytes):
+    """Return a keyed HMAC-SHA256 object to copy for each signature.
     
-    For token requests, we need to use this specific signature method.
+    The keyed object already holds the SHA256 states seeded with the
+    ipad/opad-XORed key, so copy() skips the key setup done by hmac.new().
     """
-    # Create string to sign
-    string_to_sign = client_id + timestamp + nonce
+    return hmac.new(secret_bytes, b"", hashlib.sha256)
+
+def sign_token_request(client_id, client_secret, timestamp, nonce):
+    """Generate the Tuya API signature of a token request.
+    
+    Token requests sign client_id + t + nonce and send the signature base64
+    encoded.
+    """
+    # Create the bytes to sign in a single formatting and encoding pass
+    string_to_sign = f"{client_id}{timestamp}{nonce}".encode('utf-8')
     
     # Sign it
-    signature = hmac.new(
-        client_secret.encode('utf-8'),
-        string_to_sign.encode('utf-8'),
-        hashlib.sha256
-    ).digest()
+    signature = hmac_template(client_secret.encode('utf-8')).copy()
+    signature.update(string_to_sign)
+    signature = signature.digest()
     
     # Base64 encode the signature
     sign_hex = base64.b64encode(signature).decode('utf-8')
     
     return sign_hex
 
+def business_sign_prefix(client_id, access_token):
+    """Return the encoded client_id + access_token head of a business signature.
+    
+    It only changes with the access token, so callers keep it between
+    requests.
+    """
+    return f"{client_id}{access_token}".encode('utf-8')
+
+def sign_business_request(template, sign_prefix, timestamp):
+    """Generate the Tuya API signature of a business (device) request.
+    
+    Business requests sign client_id + access_token + t and send the
+    signature as upper-case hex. template is hmac_template() of the client
+    secret and sign_prefix comes from business_sign_prefix().
+    """
+    signature = template.copy()
+    signature.update(sign_prefix + timestamp.encode('ascii'))
+    return signature.hexdigest().upper()
+
+def verify_tuya_signature(secret, message, given_hex):
+    """Check a hex HMAC-SHA256 signature received from Tuya.
+    
+    Signatures must always be compared with this helper: hmac.compare_digest
+    takes the same time however many characters match, unlike ==.
+    """
+    expected = hmac_template(secret).copy()
+    expected.update(message)
+    expected = expected.hexdigest().upper()
+    return hmac.compare_digest(expected, given_hex.upper())
+
 def generate_nonce():
-    """Generate a random nonce string."""
-    return str(uuid.uuid4())
+    """Generate a random nonce string.
+    
+    Hex of 16 random bytes from the OS CSPRNG, without building a UUID.
+    """
+    return secrets.token_hex(16)
+
+@functools.lru_cache(maxsize=8)
+def _client_headers(client_id):
+    """Return the headers that never change for a client's token requests.
+    
+    The returned dict is shared and must not be modified; it is copied into
+    the headers of each request.
+    """
+    return {**TUYA_STATIC_HEADERS, "client_id": client_id}
+
+def _token_headers(client_id, client_secret):
+    """Return the signed headers of a token request.
+    
+    Signing takes a few microseconds on OpenSSL's SHA256, so it runs inline
+    on the event loop; a thread hop would cost more than it saves.
+    """
+    timestamp = str(time.time_ns() // 1_000_000)
+    nonce = generate_nonce()
+    
+    return {
+        **_client_headers(client_id),
+        "sign": sign_token_request(client_id, client_secret, timestamp, nonce),
+        "t": timestamp,
+        "nonce": nonce
+    }
+
+# Tuya error codes of a success=false response that are transient (rate
+# limiting), so the token request is tried again
+_RETRYABLE_CODES = {1106, 28841105}
+
+async def _async_request_token(session, url, client_id, client_secret, action):
+    """Request a token from url and return its info, or None on failure.
+    
+    Timeouts, connection errors, 5xx responses and the rate-limit codes of
+    _RETRYABLE_CODES are retried up to TOKEN_REQUEST_ATTEMPTS times with
+    exponential backoff; other failures return None at once. action names
+    the request in log messages.
+    """
+    for attempt in range(TOKEN_REQUEST_ATTEMPTS):
+        if attempt:
+            # Back off exponentially between attempts: 1s, 2s, ...
+            await asyncio.sleep(2 ** (attempt - 1))
+        
+        # Sign each attempt with a fresh timestamp and nonce
+        headers = _token_headers(client_id, client_secret)
+        
+        try:
+            async with async_timeout.timeout(10):
+                async with session.get(url, headers=headers) as response:
+                    # Server errors are transient, so try again
+                    if response.status >= 500:
+                        _LOGGER.warning(
+                            "%s failed with status %s (attempt %s of %s)",
+                            action, response.status, attempt + 1, TOKEN_REQUEST_ATTEMPTS
+                        )
+                        continue
+                    
+                    # The body is only read as text on the error path
+                    if response.status != 200:
+                        _LOGGER.error("%s failed with status %s: %s", action, response.status, await response.text())
+                        return None
+                    
+                    body = await response.read()
+                    try:
+                        data = json_loads(body)
+                    except Exception as e:
+                        _LOGGER.error("Failed to parse JSON response: %s", e)
+                        _LOGGER.error("Response text: %s", body.decode("utf-8", "replace"))
+                        return None
+                    
+                    if _LOGGER.isEnabledFor(logging.DEBUG):
+                        _LOGGER.debug("%s response: %s", action, data)
+                    
+                    if not data.get("success", False):
+                        error_msg = data.get("msg", "Unknown error")
+                        if data.get("code") in _RETRYABLE_CODES:
+                            _LOGGER.warning(
+                                "%s rate limited: %s (attempt %s of %s)",
+                                action, error_msg, attempt + 1, TOKEN_REQUEST_ATTEMPTS
+                            )
+                            continue
+                        _LOGGER.error("%s failed: %s", action, error_msg)
+                        return None
+                    
+                    result = data.get("result", {})
+                    if not result:
+                        _LOGGER.error("Empty result from %s", action)
+                        return None
+                    
+                    expire_time = result.get("expire_time")
+                    
+                    return {
+                        "access_token": result.get("access_token"),
+                        "refresh_token": result.get("refresh_token"),
+                        "expire_time": expire_time,
+                        # Wall-clock expiry for storage, and a monotonic one for
+                        # comparisons that are immune to clock changes
+                        "expiration_time": time.time_ns() // 1_000_000_000 + int(expire_time),
+                        "expires_at_mono": time.monotonic() + int(expire_time)
+                    }
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            _LOGGER.warning(
+                "%s request error (attempt %s of %s): %s",
+                action, attempt + 1, TOKEN_REQUEST_ATTEMPTS, e
+            )
+    
+    _LOGGER.error("%s failed after %s attempts", action, TOKEN_REQUEST_ATTEMPTS)
+    return None
 
 async def refresh_tuya_token(session, client_id, client_secret, refresh_token, region="us"):
     """Refresh Tuya access token using the refresh token."""
     try:
-        base_url = TUYA_REGION_ENDPOINTS.get(region, TUYA_REGION_ENDPOINTS["us"])
-        refresh_url = f"{base_url}/v1.0/token/{refresh_token}"
-        
-        # Generate timestamp and nonce
-        timestamp = str(int(time.time() * 1000))
-        nonce = generate_nonce()
-        
-        # Generate signature
-        sign = generate_sign(client_id, client_secret, timestamp, nonce)
+        refresh_url = _REFRESH_URLS.get(region, _REFRESH_URLS["us"]) + refresh_token
         
-        # Prepare headers
-        headers = {
-            "client_id": client_id,
-            "sign": sign,
-            "t": timestamp,
-            "nonce": nonce,
-            "sign_method": "HMAC-SHA256",
-            "Content-Type": "application/json"
-        }
+        _LOGGER.debug("Attempting to refresh token with URL: %s", refresh_url)
         
-        _LOGGER.debug(f"Attempting to refresh token with URL: {refresh_url}")
-        _LOGGER.debug(f"Headers: {headers}")
-        
-        async with async_timeout.timeout(10):
-            async with session.get(refresh_url, headers=headers) as response:
-                response_text = await response.text()
-                _LOGGER.debug(f"Token refresh API response: {response_text}")
-                
-                if response.status != 200:
-                    _LOGGER.error(f"Token refresh failed with status {response.status}: {response_text}")
-                    return None
-                    
-                try:
-                    data = await response.json()
-                except Exception as e:
-                    _LOGGER.error(f"Failed to parse JSON response: {e}")
-                    _LOGGER.error(f"Response text: {response_text}")
-                    return None
-                
-                _LOGGER.debug(f"Token refresh response: {data}")
-                
-                if not data.get("success", False):
-                    error_msg = data.get("msg", "Unknown error")
-                    _LOGGER.error(f"Token refresh failed: {error_msg}")
-                    return None
-                
-                result = data.get("result", {})
-                if not result:
-                    _LOGGER.error("Empty result from token refresh")
-                    return None
-                
-                access_token = result.get("access_token")
-                refresh_token = result.get("refresh_token")
-                expire_time = result.get("expire_time")
-                
-                _LOGGER.info(f"Successfully refreshed token. New token expires in {expire_time} seconds")
-                
-                return {
-                    "access_token": access_token,
-                    "refresh_token": refresh_token,
-                    "expire_time": expire_time,
-                    "expiration_time": int(time.time()) + int(expire_time)
-                }
+        token_info = await _async_request_token(
+            session, refresh_url, client_id, client_secret, "Token refresh"
+        )
+        if token_info:
+            _LOGGER.info("Successfully refreshed token. New token expires in %s seconds", token_info["expire_time"])
+        return token_info
     
     except Exception as e:
-        _LOGGER.error(f"Error refreshing Tuya token: {e}", exc_info=True)
+        _LOGGER.error("Error refreshing Tuya token: %s", e, exc_info=True)
         return None
 
 async def get_new_token(session, client_id, client_secret, region="us"):
     """Get a new token from Tuya API."""
     try:
-        base_url = TUYA_REGION_ENDPOINTS.get(region, TUYA_REGION_ENDPOINTS["us"])
-        token_url = f"{base_url}/v1.0/token?grant_type=1"
+        token_url = _TOKEN_URLS.get(region, _TOKEN_URLS["us"])
         
-        # Generate timestamp and nonce
-        timestamp = str(int(time.time() * 1000))
-        nonce = generate_nonce()
+        _LOGGER.debug("Attempting to get new token with URL: %s", token_url)
         
-        # Generate signature
-        sign = generate_sign(client_id, client_secret, timestamp, nonce)
+        token_info = await _async_request_token(
+            session, token_url, client_id, client_secret, "Get token"
+        )
+        if token_info:
+            _LOGGER.info("Successfully obtained new token. Token expires in %s seconds", token_info["expire_time"])
+        return token_info
+    
+    except Exception as e:
+        _LOGGER.error("Error getting new Tuya token: %s", e, exc_info=True)
+        return None
+
+# Last token issued for each (client_id, region), and the locks making
+# sure only one request for a new token is in flight per key
+_TOKEN_CACHE = {}
+_TOKEN_LOCKS = {}
+
+async def get_cached_token(session, client_id, client_secret, region="us", refresh_token=None):
+    """Return a token for the client, requesting one only when needed.
+    
+    A cached token is returned until it is within TOKEN_EXPIRY_BUFFER of
+    expiring; it is then refreshed with its refresh token (or the one
+    given), falling back to a brand new token.
+    """
+    key = (client_id, region)
+    lock = _TOKEN_LOCKS.setdefault(key, asyncio.Lock())
+    
+    async with lock:
+        token_info = _TOKEN_CACHE.get(key)
+        if token_info:
+            if time.monotonic() < token_info["expires_at_mono"] - TOKEN_EXPIRY_BUFFER:
+                return token_info
+            refresh_token = token_info["refresh_token"] or refresh_token
         
-        # Prepare headers
-        headers = {
-            "client_id": client_id,
-            "sign": sign,
-            "t": timestamp,
-            "nonce": nonce,
-            "sign_method": "HMAC-SHA256",
-            "Content-Type": "application/json"
-        }
+        new_token_info = None
+        if refresh_token:
+            new_token_info = await refresh_tuya_token(
+                session, client_id, client_secret, refresh_token, region
+            )
         
-        _LOGGER.debug(f"Attempting to get new token with URL: {token_url}")
-        _LOGGER.debug(f"Headers: {headers}")
+        if not new_token_info:
+            new_token_info = await get_new_token(session, client_id, client_secret, region)
         
-        async with async_timeout.timeout(10):
-            async with session.get(token_url, headers=headers) as response:
-                response_text = await response.text()
-                _LOGGER.debug(f"Token API response: {response_text}")
-                
-                if response.status != 200:
-                    _LOGGER.error(f"Get token failed with status {response.status}: {response_text}")
-                    return None
-                    
-                try:
-                    data = await response.json()
-                except Exception as e:
-                    _LOGGER.error(f"Failed to parse JSON response: {e}")
-                    _LOGGER.error(f"Response text: {response_text}")
-                    return None
-                
-                _LOGGER.debug(f"Token response: {data}")
-                
-                if not data.get("success", False):
-                    error_msg = data.get("msg", "Unknown error")
-                    _LOGGER.error(f"Get token failed: {error_msg}")
-                    return None
-                
-                result = data.get("result", {})
-                if not result:
-                    _LOGGER.error("Empty result from get token")
-                    return None
-                
-                access_token = result.get("access_token")
-                refresh_token = result.get("refresh_token")
-                expire_time = result.get("expire_time")
-                
-                _LOGGER.info(f"Successfully obtained new token. Token expires in {expire_time} seconds")
-                
-                return {
-                    "access_token": access_token,
-                    "refresh_token": refresh_token,
-                    "expire_time": expire_time,
-                    "expiration_time": int(time.time()) + int(expire_time)
-                }
+        if new_token_info:
+            _TOKEN_CACHE[key] = new_token_info
+        return new_token_info
+
+def invalidate_cached_token(client_id, region="us"):
+    """Forget the cached token of the client, so the next call requests one.
     
-    except Exception as e:
-        _LOGGER.error(f"Error getting new Tuya token: {e}", exc_info=True)
-        return None
+    Used when Tuya rejected the token as invalid or expired, and when the
+    config entry using it is unloaded.
+    """
+    _TOKEN_CACHE.pop((client_id, region), None)
@@ -0,0 +1,38 @@
+"""Tests for the Tuya Monitor coordinator."""
+from collections import deque
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.tuya_monitor import TuyaBulkCoordinator
+from custom_components.tuya_monitor.const import CHANGE_HISTORY_SIZE
+
+
+def _coordinator(device_ids, scan_interval=60, max_interval=600):
+    """Return the state _next_interval uses, without a running hass."""
+    return SimpleNamespace(
+        data=None,
+        _scan_interval=scan_interval,
+        _max_interval=max_interval,
+        _polling_started=0,
+        _change_times={
+            device_id: deque(maxlen=CHANGE_HISTORY_SIZE) for device_id in device_ids
+        },
+    )
+
+
+def test_next_interval_records_changes_of_every_device():
+    """Changes of later devices are recorded once an earlier one is fast."""
+    coordinator = _coordinator(["a", "b"])
+    
+    for poll in range(4):
+        data = {"a": {"value": poll}, "b": {"value": poll}}
+        with patch("custom_components.tuya_monitor.time.monotonic", return_value=60 * poll):
+            interval = TuyaBulkCoordinator._next_interval(coordinator, data)
+        coordinator.data = data
+    
+    assert {device_id: len(times) for device_id, times in coordinator._change_times.items()} == {"a": 3, "b": 3}
+    assert interval == 60